@@ -1,12 +1,29 @@
+import argparse
+import asyncio
+import json
 import os
-from concurrent.futures import ThreadPoolExecutor
-from web3 import Web3
+from urllib.parse import urlparse
+
+import aiohttp
+from eth_abi import encode as abi_encode
+from web3 import AsyncWeb3, AsyncHTTPProvider, AsyncIPCProvider
 from eth_account import Account
+from eth_account.messages import encode_defunct
 
 # Config
 RPC_URL = os.getenv("RPC_URL", "http://localhost:8547")
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")
 
+# With the node on this host, a Unix domain socket skips the TCP/HTTP stack
+# entirely; set IPC_PATH to the node's .ipc socket to use it
+IPC_PATH = os.getenv("IPC_PATH")
+_LOCAL_HOSTS = ("localhost", "127.0.0.1")
+
+# Bundle relay for --bundle mode; the auth key only signs the request body
+# (X-Flashbots-Signature), it never holds funds
+BUNDLE_RELAY_URL = os.getenv("BUNDLE_RELAY_URL", "https://relay.flashbots.net")
+FLASHBOTS_AUTH_KEY = os.getenv("FLASHBOTS_AUTH_KEY")
+
 PROP_AMM_ADDRESS = "0xDc64a140Aa3E981100a9becA4E685f962f0cF6C9"
 GLOBAL_STORAGE_ADDRESS = "0xe7f1725E7734CE288F8367e1Bb143E90bb3F0512"
 WETH_ADDRESS = "0x9fE46736679d2D9a65F0992F2272dE9f3c7fa6e0"
@@ -15,219 +32,528 @@ USDC_ADDRESS = "0xCf7Ed3AccA5a467e9e704C703E8D87F634fB0Fc9"
 # Pair ID for WETH/USDC (calculated from getPairId)
 PAIR_ID = "0x667546a103822a3ea5b74bdf319f969f53de0a26339708852cfa21db6575a3be"
 
-# PropAMM ABI
-PROP_AMM_ABI = [
-    {
-        "inputs": [
-            {"internalType": "bytes32", "name": "pairId", "type": "bytes32"},
-            {"internalType": "uint256", "name": "amountXIn", "type": "uint256"},
-            {"internalType": "uint256", "name": "minAmountYOut", "type": "uint256"},
-        ],
-        "name": "swapXtoY",
-        "outputs": [{"internalType": "uint256", "name": "amountYOut", "type": "uint256"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "bytes32", "name": "pairId", "type": "bytes32"},
-        ],
-        "name": "getParameterKeys",
-        "outputs": [{"internalType": "bytes32[]", "name": "keys", "type": "bytes32[]"}],
-        "stateMutability": "pure",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "uint256", "name": "concentration", "type": "uint256"},
-            {"internalType": "uint256", "name": "multX", "type": "uint256"},
-            {"internalType": "uint256", "name": "multY", "type": "uint256"},
-        ],
-        "name": "encodeParameters",
-        "outputs": [{"internalType": "bytes32[]", "name": "values", "type": "bytes32[]"}],
-        "stateMutability": "pure",
-        "type": "function",
-    },
-]
+# Constant derivations resolved once at import so the hot path (and repeated
+# main() calls when looped) does no re-decoding or checksumming
+PAIR_ID_BYTES = bytes.fromhex(PAIR_ID[2:])
+PROP_AMM_CS = AsyncWeb3.to_checksum_address(PROP_AMM_ADDRESS)
+GS_CS = AsyncWeb3.to_checksum_address(GLOBAL_STORAGE_ADDRESS)
+
+GWEI_1 = 1_000_000_000
+GWEI_10 = 10_000_000_000
+
+# Gas limits calibrated once with --estimate; both functions have a fixed
+# shape so per-run eth_estimateGas (a full EVM simulation) is wasted work
+GAS_LIMIT_SWAP = 250_000
+GAS_LIMIT_UPDATE = 150_000
 
-# GlobalStorage ABI
-GLOBAL_STORAGE_ABI = [
-    {
-        "inputs": [
-            {"internalType": "bytes32[]", "name": "keys", "type": "bytes32[]"},
-            {"internalType": "bytes32[]", "name": "values", "type": "bytes32[]"},
-        ],
-        "name": "setBatch",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
+# Default receipt poll interval: web3's 0.1s default hammers the node with
+# eth_getTransactionReceipt calls. Overridden at runtime from the observed
+# inter-block time, and only used at all when the node lacks
+# eth_sendRawTransactionSync.
+RECEIPT_POLL_LATENCY = 1.0
+
+# 4-byte selectors; with only two fixed function shapes in play, raw
+# selector + eth_abi encoding replaces the whole w3.eth.contract wrapper
+# (ContractFunctions, ABIRegistry, per-call validation)
+SWAP_X_TO_Y_SELECTOR = AsyncWeb3.keccak(text="swapXtoY(bytes32,uint256,uint256)")[:4]
+SET_BATCH_SELECTOR = AsyncWeb3.keccak(text="setBatch(bytes32[],bytes32[])")[:4]
+
+# GlobalStorage keys for this pair, mirroring PropAMM._getStorageKey:
+# keccak256(keccak256(prefixName) ++ pairId) per parameter, in the order
+# getParameterKeys returns them (concentration, multX, multY)
+PARAMETER_KEYS = [
+    AsyncWeb3.keccak(AsyncWeb3.keccak(text=prefix) + PAIR_ID_BYTES)
+    for prefix in ("CONCENTRATION", "MULT_X", "MULT_Y")
 ]
 
 
-def gwei(n: int) -> int:
-    return int(n) * 10**9
+def _make_session() -> aiohttp.ClientSession:
+    """Keep-alive session shared by web3 and rpc_batch.
 
+    One pool covers the batch POST and every provider call, so no request
+    pays a fresh TCP/TLS handshake; 20 connections leaves headroom for the
+    concurrent send/wait coroutines.
+    """
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=20),
+        timeout=aiohttp.ClientTimeout(total=30),
+    )
 
-def main() -> None:
-    w3 = Web3(Web3.HTTPProvider(RPC_URL))
-    account = Account.from_key(PRIVATE_KEY)
-    sender = account.address
-    chain_id = w3.eth.chain_id
-    
-    print(f"Connected to chain ID: {chain_id}")
-    print(f"Sender address: {sender}")
-    
-    # Initialize PropAMM contract
-    amm_contract = w3.eth.contract(
-        address=Web3.to_checksum_address(PROP_AMM_ADDRESS),
-        abi=PROP_AMM_ABI,
+
+async def rpc_batch(session: aiohttp.ClientSession, calls: list) -> list:
+    """POST one JSON-RPC batch and return results in the order of `calls`.
+
+    `calls` is a list of (method, params) tuples. Responses are matched by
+    their `id` field since the server may reorder them.
+    """
+    payload = [
+        {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+        for i, (method, params) in enumerate(calls)
+    ]
+    async with session.post(RPC_URL, json=payload) as resp:
+        resp.raise_for_status()
+        body = await resp.json()
+    by_id = {item["id"]: item for item in body}
+    results = []
+    for i, (method, _) in enumerate(calls):
+        item = by_id[i]
+        if "error" in item:
+            raise RuntimeError(f"RPC error from {method}: {item['error']}")
+        results.append(item["result"])
+    return results
+
+
+def encode_parameters(concentration: int, mult_x: int, mult_y: int) -> list:
+    """Local mirror of PropAMM.encodeParameters: bytes32(v) per value.
+
+    The function is pure, so packing the values here (with the contract's
+    own concentration bounds check) saves an eth_call round-trip.
+    """
+    if not 1 <= concentration < 2000:
+        raise ValueError("concentration must be in [1, 2000)")
+    return [v.to_bytes(32, "big") for v in (concentration, mult_x, mult_y)]
+
+
+class NonceCache:
+    """Process-local nonce allocator for repeated runs.
+
+    get_transaction_count(sender, "pending") is a full round-trip per run
+    and racy under concurrent scripts; seed the counter from the node once
+    and hand out consecutive nonces locally. invalidate() drops the seed so
+    the next run refetches (recovery from "nonce too low" failures).
+    """
+
+    def __init__(self) -> None:
+        self._next = None
+
+    @property
+    def seeded(self) -> bool:
+        return self._next is not None
+
+    def seed(self, nonce: int) -> None:
+        self._next = nonce
+
+    def next_pair(self) -> tuple:
+        pair = (self._next, self._next + 1)
+        self._next += 2
+        return pair
+
+    def invalidate(self) -> None:
+        self._next = None
+
+
+_NONCES = NonceCache()
+
+
+async def rpc_calls(w3: AsyncWeb3, session: aiohttp.ClientSession, calls: list) -> list:
+    """Issue a group of JSON-RPC calls through whichever transport is active.
+
+    Over HTTP the group goes out as a single batch POST (one round-trip).
+    Over IPC, where each call is already a cheap Unix-socket round-trip,
+    the calls simply run concurrently on the persistent connection.
+    """
+    if not isinstance(w3.provider, AsyncIPCProvider):
+        return await rpc_batch(session, calls)
+    replies = await asyncio.gather(
+        *(w3.provider.make_request(method, params) for method, params in calls)
     )
-    
-    # Initialize GlobalStorage contract
-    global_storage_contract = w3.eth.contract(
-        address=Web3.to_checksum_address(GLOBAL_STORAGE_ADDRESS),
-        abi=GLOBAL_STORAGE_ABI,
+    results = []
+    for (method, _), reply in zip(calls, replies):
+        if reply.get("error") is not None:
+            raise RuntimeError(f"RPC error from {method}: {reply['error']}")
+        results.append(reply["result"])
+    return results
+
+
+async def _fallback_poll_latency(w3: AsyncWeb3, session: aiohttp.ClientSession, latest: dict) -> float:
+    """Receipt poll interval adapted to the observed inter-block time.
+
+    A third of the last block interval, floored at 0.5s; only consulted
+    when a waiter actually has to poll.
+    """
+    parent_hash = latest.get("parentHash")
+    if parent_hash:
+        (parent,) = await rpc_calls(w3, session, [("eth_getBlockByHash", [parent_hash, False])])
+        if parent:
+            block_time = int(latest["timestamp"], 16) - int(parent["timestamp"], 16)
+            return max(0.5, block_time / 3)
+    return RECEIPT_POLL_LATENCY
+
+
+def _format_receipt(raw: dict) -> dict:
+    """Hex-decode the receipt fields the results printer reads."""
+    receipt = dict(raw)
+    for field in ("status", "blockNumber", "gasUsed", "effectiveGasPrice", "transactionIndex"):
+        if isinstance(receipt.get(field), str):
+            receipt[field] = int(receipt[field], 16)
+    return receipt
+
+
+async def send_and_wait(w3: AsyncWeb3, signed, poll_latency: float) -> dict:
+    """Send one signed transaction and return its receipt.
+
+    Prefers eth_sendRawTransactionSync, where the node holds the request
+    open and answers with the receipt at inclusion — no client-side poll
+    jitter. A timeout error (-32002) means the tx was accepted into the
+    pool but missed the server-side window (expected for the low-fee tx on
+    slow blocks), so we just poll for its receipt; re-sending would fail
+    with "already known". Only "method not found" (-32601) falls back to
+    the classic send + poll pair, and anything else is a real rejection.
+    """
+    reply = await w3.provider.make_request(
+        "eth_sendRawTransactionSync", [AsyncWeb3.to_hex(signed.raw_transaction)]
     )
-    
+    if reply.get("result") is not None:
+        return _format_receipt(reply["result"])
+    error = reply.get("error") or {}
+    code = error.get("code")
+    if code == -32002:  # sync-send timeout: tx is pooled, not yet included
+        return await w3.eth.wait_for_transaction_receipt(signed.hash, poll_latency=poll_latency)
+    if code == -32601:  # method not available on this node
+        tx_hash = await w3.eth.send_raw_transaction(signed.raw_transaction)
+        return await w3.eth.wait_for_transaction_receipt(tx_hash, poll_latency=poll_latency)
+    raise RuntimeError(f"eth_sendRawTransactionSync failed: {error}")
+
+
+async def send_bundle(session: aiohttp.ClientSession, signed_txs: list, target_block: int) -> dict:
+    """Submit signed transactions as one atomic bundle via eth_sendBundle.
+
+    The builder enforces intra-bundle order, so the parameter update is
+    guaranteed to execute before the swap instead of relying on speculative
+    fee-priority ordering. The request body is signed with
+    FLASHBOTS_AUTH_KEY for the X-Flashbots-Signature header.
+    """
+    body = json.dumps({
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "eth_sendBundle",
+        "params": [{
+            "txs": [AsyncWeb3.to_hex(tx.raw_transaction) for tx in signed_txs],
+            "blockNumber": hex(target_block),
+        }],
+    })
+    auth = Account.from_key(FLASHBOTS_AUTH_KEY)
+    # The relay recovers the signer from the 0x-prefixed hash string;
+    # HexBytes.hex() is unprefixed on web3 7's hexbytes, so be explicit
+    signature = Account.sign_message(
+        encode_defunct(text=AsyncWeb3.to_hex(AsyncWeb3.keccak(text=body))),
+        FLASHBOTS_AUTH_KEY,
+    ).signature
+    headers = {
+        "Content-Type": "application/json",
+        "X-Flashbots-Signature": f"{auth.address}:{AsyncWeb3.to_hex(signature)}",
+    }
+    async with session.post(BUNDLE_RELAY_URL, data=body, headers=headers) as resp:
+        resp.raise_for_status()
+        reply = await resp.json()
+    if "error" in reply:
+        raise RuntimeError(f"Bundle relay error: {reply['error']}")
+    return reply["result"]
+
+
+_ctx = None
+
+
+async def _get_ctx() -> tuple:
+    """Lazy per-process context shared by repeated main() calls.
+
+    One session/provider, one key -> address derivation, one eth_chainId
+    fetch: all invariant, so a loop over main() pays for them exactly once.
+    """
+    global _ctx
+    if _ctx is None:
+        session = _make_session()
+        if IPC_PATH and urlparse(RPC_URL).hostname in _LOCAL_HOSTS:
+            w3 = AsyncWeb3(AsyncIPCProvider(IPC_PATH))
+            await w3.provider.connect()
+        else:
+            provider = AsyncHTTPProvider(RPC_URL)
+            await provider.cache_async_session(session)
+            w3 = AsyncWeb3(provider)
+        account = Account.from_key(PRIVATE_KEY)
+        (chain_id_hex,) = await rpc_calls(w3, session, [("eth_chainId", [])])
+        _ctx = (w3, session, account, int(chain_id_hex, 16))
+    return _ctx
+
+
+async def _close_ctx() -> None:
+    global _ctx
+    if _ctx is not None:
+        w3, session = _ctx[0], _ctx[1]
+        if isinstance(w3.provider, AsyncIPCProvider):
+            await w3.provider.disconnect()
+        await session.close()
+        _ctx = None
+
+
+async def main(estimate: bool = False, bundle: bool = False) -> None:
+    w3, session, account, chain_id = await _get_ctx()
+    sender = account.address
+
     # Swap amount: 1 WETH
-    swap_amount_weth = Web3.to_wei(1, 'ether')
-    
-    # Prepare swapXtoY transaction (HIGH priority fee)
-    swap_func = amm_contract.functions.swapXtoY(
-        bytes.fromhex(PAIR_ID[2:]),  # Remove '0x' prefix
-        swap_amount_weth,
-        0,  # minAmountYOut (0 for simplicity)
+    swap_amount_weth = AsyncWeb3.to_wei(1, 'ether')
+
+    # Prepare swapXtoY calldata (HIGH priority fee), encoded once
+    swap_data = SWAP_X_TO_Y_SELECTOR + abi_encode(
+        ["bytes32", "uint256", "uint256"],
+        (PAIR_ID_BYTES, swap_amount_weth, 0),  # minAmountYOut 0 for simplicity
     )
-    
-    # Prepare GlobalStorage.setBatch() transaction for parameter update (LOW priority fee)
+
+    # Prepare GlobalStorage.setBatch() calldata for parameter update (LOW priority fee)
     # This will get ToB priority because the transaction's 'to' is GlobalStorage
     new_concentration = 150
     new_mult_x = 10**18
     new_mult_y = 3000 * 10**18
-    
-    # Get keys and values from PropAMM helper functions
-    pair_id_bytes = bytes.fromhex(PAIR_ID[2:])  # Remove '0x' prefix
-    keys = amm_contract.functions.getParameterKeys(pair_id_bytes).call()
-    values = amm_contract.functions.encodeParameters(new_concentration, new_mult_x, new_mult_y).call()
-    
-    update_func = global_storage_contract.functions.setBatch(keys, values)
-    
+
+    # Keys and values replicate PropAMM's pure getParameterKeys /
+    # encodeParameters helpers off-chain, saving the last pre-send eth_call
+    values = encode_parameters(new_concentration, new_mult_x, new_mult_y)
+
+    update_data = SET_BATCH_SELECTOR + abi_encode(["bytes32[]", "bytes32[]"], (PARAMETER_KEYS, values))
+
+    # One JSON-RPC batch replaces the sequential round-trips (latest block;
+    # nonce only when the cache is cold; gas estimates only when calibrating)
+    calls = [("eth_getBlockByNumber", ["latest", False])]
+    if not _NONCES.seeded:
+        calls.append(("eth_getTransactionCount", [sender, "pending"]))
+    if estimate:
+        calls += [
+            ("eth_estimateGas", [{"from": sender, "to": PROP_AMM_CS, "data": "0x" + swap_data.hex()}]),
+            ("eth_estimateGas", [{"from": sender, "to": GS_CS, "data": "0x" + update_data.hex()}]),
+        ]
+    results = iter(await rpc_calls(w3, session, calls))
+    latest = next(results)
+    if not _NONCES.seeded:
+        _NONCES.seed(int(next(results), 16))
+    if estimate:
+        gas_swap = int(next(results), 16) + 20000
+        gas_update = int(next(results), 16) + 20000
+        print(f"Estimated gas (+20k buffer) - Swap: {gas_swap:,}, Update: {gas_update:,}")
+    else:
+        gas_swap = GAS_LIMIT_SWAP
+        gas_update = GAS_LIMIT_UPDATE
+    nonce_update, nonce_swap = _NONCES.next_pair()
+
+    print(f"Connected to chain ID: {chain_id}")
+    print(f"Sender address: {sender}")
+
     # Fee config: HIGH priority for swap, LOW priority for update
-    latest = w3.eth.get_block("latest")
     base_fee = latest.get("baseFeePerGas")
     if base_fee is not None:
+        base_fee = int(base_fee, 16)
         fee_high = {
-            "maxPriorityFeePerGas": gwei(10),  # HIGH priority
-            "maxFeePerGas": base_fee * 2 + gwei(10),
+            "maxPriorityFeePerGas": GWEI_10,  # HIGH priority
+            "maxFeePerGas": base_fee * 2 + GWEI_10,
         }
         fee_low = {
-            "maxPriorityFeePerGas": gwei(1),  # LOW priority
-            "maxFeePerGas": base_fee * 2 + gwei(1),
+            "maxPriorityFeePerGas": GWEI_1,  # LOW priority
+            "maxFeePerGas": base_fee * 2 + GWEI_1,
         }
     else:
         # Legacy fallback
-        fee_high = {"gasPrice": gwei(100)}
-        fee_low = {"gasPrice": gwei(20)}
-    
-    base_nonce = w3.eth.get_transaction_count(sender, "pending")
-    
-    # Estimate gas
-    gas_swap = swap_func.estimate_gas({"from": sender})
-    gas_update = update_func.estimate_gas({"from": sender})
-    
-    print(f"\nEstimated gas - Swap: {gas_swap:,}, Update: {gas_update:,}")
-    
-    # Build transactions
+        fee_high = {"gasPrice": 100 * GWEI_1}
+        fee_low = {"gasPrice": 20 * GWEI_1}
+
+    # Build transactions as plain dicts around the precomputed calldata
+    # (only nonce and fees would change across runs; the data bytes never do)
 
     # Update gets low priority fee
-    tx_update = update_func.build_transaction({
-        "from": sender,
-        "nonce": base_nonce,
+    tx_update = {
+        "to": GS_CS,
+        "data": update_data,
+        "nonce": nonce_update,
         "chainId": chain_id,
-        "gas": gas_update + 20000,
+        "gas": gas_update,
         **fee_low,
-    })
-
+    }
 
     # Swap gets high priority fee
-    tx_swap = swap_func.build_transaction({
-        "from": sender,
-        "nonce": base_nonce+1,
+    tx_swap = {
+        "to": PROP_AMM_CS,
+        "data": swap_data,
+        "nonce": nonce_swap,
         "chainId": chain_id,
-        "gas": gas_swap + 20000,
+        "gas": gas_swap,
         **fee_high,
-    })
-    
-    # Sign transactions
-    signed_swap = Account.sign_transaction(tx_swap, PRIVATE_KEY)
-    signed_update = Account.sign_transaction(tx_update, PRIVATE_KEY)
-    
+    }
+
+    # Sign transactions concurrently: each signing is CPU-bound ECDSA +
+    # keccak, and with the coincurve backend installed the native call
+    # releases the GIL, so the two executor threads actually overlap.
+    # The parent-header lookup that tunes the fallback poll interval rides
+    # along here instead of costing its own serial round-trip, and is
+    # skipped outright in bundle mode where nothing ever polls.
+    loop = asyncio.get_running_loop()
+    sign_jobs = [
+        loop.run_in_executor(None, Account.sign_transaction, tx_update, PRIVATE_KEY),
+        loop.run_in_executor(None, Account.sign_transaction, tx_swap, PRIVATE_KEY),
+    ]
+    if bundle:
+        signed_update, signed_swap = await asyncio.gather(*sign_jobs)
+        poll_latency = RECEIPT_POLL_LATENCY
+    else:
+        signed_update, signed_swap, poll_latency = await asyncio.gather(
+            *sign_jobs, _fallback_poll_latency(w3, session, latest)
+        )
+
+    if bundle:
+        # Atomic bundle path: builder-side ordering makes the race
+        # deterministic, but inclusion is not guaranteed and a missed
+        # bundle leaves nothing in the mempool, so the target block has
+        # to be checked explicitly
+        target_block = int(latest["number"], 16) + 1
+        result = await send_bundle(session, [signed_update, signed_swap], target_block)
+        print(f"\n=== Submitted atomic bundle (update before swap) ===")
+        print(f"Target block: {target_block}")
+        print(f"Bundle hash: {result.get('bundleHash')}")
+
+        while await w3.eth.block_number < target_block:
+            await asyncio.sleep(poll_latency)
+        block = await w3.eth.get_block(target_block)
+        included = {AsyncWeb3.to_hex(h) for h in block["transactions"]}
+        bundle_hashes = {AsyncWeb3.to_hex(signed_update.hash), AsyncWeb3.to_hex(signed_swap.hash)}
+        if bundle_hashes <= included:
+            print(f"✓ Bundle included in block {target_block}")
+        else:
+            # The pre-drawn nonces were never consumed on-chain and the
+            # "nonce too low" recovery can't fire (nothing was pooled), so
+            # reseed explicitly or every later run signs future-nonce txs
+            _NONCES.invalidate()
+            print(f"✗ Bundle NOT included in block {target_block}; nonce cache reseeded for the next run")
+        return
+
     print(f"\n=== Sending competing transactions ===")
     print(f"Swap transaction - Priority fee: {fee_high.get('maxPriorityFeePerGas', 0) / 10**9:.2f} gwei")
     print(f"Update transaction - Priority fee: {fee_low.get('maxPriorityFeePerGas', 0) / 10**9:.2f} gwei")
-    
-    # Send concurrently
-    with ThreadPoolExecutor(max_workers=2) as pool:
-        fut_update = pool.submit(w3.eth.send_raw_transaction, signed_update.raw_transaction)
-        fut_swap = pool.submit(w3.eth.send_raw_transaction, signed_swap.raw_transaction)
-        txhash_update = fut_update.result().hex()
-        txhash_swap = fut_swap.result().hex()
-    
-    print(f"Sent GlobalStorage.setBatch() tx (ToB): {txhash_update}")
-    print(f"\nSent swapXtoY() tx: {txhash_swap}")
-    
-    
-    # Wait for receipts concurrently
+
+    txhash_update = AsyncWeb3.to_hex(signed_update.hash)
+    txhash_swap = AsyncWeb3.to_hex(signed_swap.hash)
+    print(f"Sending GlobalStorage.setBatch() tx (ToB): {txhash_update}")
+    print(f"\nSending swapXtoY() tx: {txhash_swap}")
+
+    # Fused send+wait per tx, both in flight concurrently: the node
+    # answers with the receipt at inclusion where supported, otherwise
+    # we fall back to send + adaptive polling
     print("\nWaiting for confirmations...")
-    with ThreadPoolExecutor(max_workers=2) as pool:
-        r1 = pool.submit(w3.eth.wait_for_transaction_receipt, txhash_update)
-        r2 = pool.submit(w3.eth.wait_for_transaction_receipt, txhash_swap)
-        rcpt_update = r1.result()
-        rcpt_swap = r2.result()
-        
-    
-    # Display results
+    try:
+        tasks = {
+            asyncio.ensure_future(send_and_wait(w3, signed_update, poll_latency)): txhash_update,
+            asyncio.ensure_future(send_and_wait(w3, signed_swap, poll_latency)): txhash_swap,
+        }
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        receipts = {tasks[task]: task.result() for task in done}
+        if pending:
+            # The laggard almost always lands in the same block as the first
+            # receipt; one block lookup there saves the second polling loop
+            (laggard,) = pending
+            laggard_hash = tasks[laggard]
+            first_rcpt = next(iter(receipts.values()))
+            block = await w3.eth.get_block(first_rcpt["blockNumber"])
+            if any(AsyncWeb3.to_hex(h) == laggard_hash for h in block["transactions"]):
+                laggard.cancel()
+                try:
+                    await laggard
+                except asyncio.CancelledError:
+                    pass
+                reply = await w3.provider.make_request("eth_getTransactionReceipt", [laggard_hash])
+                receipts[laggard_hash] = _format_receipt(reply["result"])
+            else:
+                # Different block: let the remaining waiter run its course
+                receipts[laggard_hash] = await laggard
+    except Exception:
+        # The pre-drawn nonce pair may never have reached the pool (hard
+        # rejection, underpriced, insufficient funds, ...), in which case a
+        # stale counter would wedge every later in-process run exactly like
+        # a missed bundle. A spurious reseed only costs one
+        # eth_getTransactionCount, so always reseed on failure.
+        _NONCES.invalidate()
+        raise
+    finally:
+        # Never unwind with a waiter still running: the caller closes the
+        # shared session/IPC connection right after, out from under it
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    rcpt_update = receipts[txhash_update]
+    rcpt_swap = receipts[txhash_swap]
+
+    # Display results: destructure each receipt once instead of going
+    # through a dict (or AttributeDict __getattr__) lookup per field
+    status_swap = rcpt_swap["status"]
+    block_swap = rcpt_swap["blockNumber"]
+    gas_used_swap = rcpt_swap["gasUsed"]
+    price_swap = rcpt_swap["effectiveGasPrice"]
+    idx_swap = rcpt_swap["transactionIndex"]
+    cost_swap = gas_used_swap * price_swap
+
+    status_update = rcpt_update["status"]
+    block_update = rcpt_update["blockNumber"]
+    gas_used_update = rcpt_update["gasUsed"]
+    price_update = rcpt_update["effectiveGasPrice"]
+    idx_update = rcpt_update["transactionIndex"]
+    cost_update = gas_used_update * price_update
+
     print("\n" + "="*60)
     print("TRANSACTION RESULTS")
     print("="*60)
-    
+
     print(f"\n🔄 swapXtoY() Transaction: {txhash_swap}")
-    print(f"  Status: {'✓ Success' if rcpt_swap.get('status') == 1 else '✗ Failed'}")
-    print(f"  Block Number: {rcpt_swap.get('blockNumber')}")
-    print(f"  Block Hash: {rcpt_swap.get('blockHash')}")
-    print(f"  Gas Used: {rcpt_swap.get('gasUsed'):,}")
-    print(f"  Effective Gas Price: {rcpt_swap.get('effectiveGasPrice') / 10**9:.2f} gwei")
-    print(f"  Total Cost: {rcpt_swap.get('gasUsed') * rcpt_swap.get('effectiveGasPrice') / 10**18:.6f} ETH")
-    
+    print(f"  Status: {'✓ Success' if status_swap == 1 else '✗ Failed'}")
+    print(f"  Block Number: {block_swap}")
+    print(f"  Block Hash: {rcpt_swap['blockHash']}")
+    print(f"  Gas Used: {gas_used_swap:,}")
+    print(f"  Effective Gas Price: {price_swap / 10**9:.2f} gwei")
+    print(f"  Total Cost: {cost_swap / 10**18:.6f} ETH")
+
     print(f"\n⚙️  GlobalStorage.setBatch() Transaction: {txhash_update}")
-    print(f"  Status: {'✓ Success' if rcpt_update.get('status') == 1 else '✗ Failed'}")
-    print(f"  Block Number: {rcpt_update.get('blockNumber')}")
-    print(f"  Block Hash: {rcpt_update.get('blockHash')}")
-    print(f"  Gas Used: {rcpt_update.get('gasUsed'):,}")
-    print(f"  Effective Gas Price: {rcpt_update.get('effectiveGasPrice') / 10**9:.2f} gwei")
-    print(f"  Total Cost: {rcpt_update.get('gasUsed') * rcpt_update.get('effectiveGasPrice') / 10**18:.6f} ETH")
-    
+    print(f"  Status: {'✓ Success' if status_update == 1 else '✗ Failed'}")
+    print(f"  Block Number: {block_update}")
+    print(f"  Block Hash: {rcpt_update['blockHash']}")
+    print(f"  Gas Used: {gas_used_update:,}")
+    print(f"  Effective Gas Price: {price_update / 10**9:.2f} gwei")
+    print(f"  Total Cost: {cost_update / 10**18:.6f} ETH")
+
     print("\n" + "="*60)
-    if rcpt_swap.get('blockNumber') == rcpt_update.get('blockNumber'):
+    if block_swap == block_update:
         print("Both transactions landed in the SAME block!")
         # Check transaction index to see ordering
-        tx_idx_swap = rcpt_swap.get('transactionIndex')
-        tx_idx_update = rcpt_update.get('transactionIndex')
-        if tx_idx_swap < tx_idx_update:
+        if idx_swap < idx_update:
             print(f"   ⚠️ Swap (high fee) executed BEFORE update (ToB priority)")
-            print(f"    Transaction indices: swap={tx_idx_swap}, update={tx_idx_update}")
+            print(f"    Transaction indices: swap={idx_swap}, update={idx_update}")
         else:
             print(f"   ✓ Update (ToB priority) executed BEFORE swap (high fee)")
-            print(f"    Transaction indices: swap={tx_idx_swap}, update={tx_idx_update}")
+            print(f"    Transaction indices: swap={idx_swap}, update={idx_update}")
     else:
         print("Transactions landed in DIFFERENT blocks:")
-        print(f"  Swap block: {rcpt_swap.get('blockNumber')}")
-        print(f"  Update block: {rcpt_update.get('blockNumber')}")
+        print(f"  Swap block: {block_swap}")
+        print(f"  Update block: {block_update}")
     print("="*60)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Race swapXtoY against a GlobalStorage parameter update")
+    parser.add_argument(
+        "--estimate",
+        action="store_true",
+        help="estimate gas via RPC instead of the hardcoded limits (for recalibration)",
+    )
+    parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help="submit both txs as an atomic eth_sendBundle to BUNDLE_RELAY_URL "
+             "instead of racing the public mempool (needs FLASHBOTS_AUTH_KEY)",
+    )
+    args = parser.parse_args()
+    if args.bundle and not FLASHBOTS_AUTH_KEY:
+        parser.error("--bundle requires the FLASHBOTS_AUTH_KEY env var")
+
+    async def _run() -> None:
+        try:
+            await main(estimate=args.estimate, bundle=args.bundle)
+        finally:
+            await _close_ctx()
+
+    asyncio.run(_run())
 
-# cast block --rpc-url http://localhost:8547 757
\ No newline at end of file
+# cast block --rpc-url http://localhost:8547 757